@@ -2,12 +2,63 @@
 
 import os
 import io
+import re
 import sys
+import mmap
+import struct
 import datetime
 import hashlib
 import shutil
+import sqlite3
+import logging
+import concurrent.futures
+
+# BLAKE3 and xxh3 are SIMD-accelerated and much faster than SHA for dedup checksums; both are
+# optional and we fall back to hashlib when neither is installed
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 import xml.etree.ElementTree as ET
 
+# Progress goes through logging rather than print: arguments are only formatted when the record
+# is actually emitted, and the whole move loop can be silenced by raising the level
+log = logging.getLogger(__name__)
+
+# XMP packets are scanned with a regex for the one timestamp we need; building a full XML tree
+# with ElementTree is kept only as a fallback for when the regex misses
+XMP_DATE_TIME_ORIGINAL = re.compile(rb'DateTimeOriginal[^"\'>]*["\'>](\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})')
+XMP_DATE_CREATED = re.compile(rb'DateCreated[^"\'>]*["\'>](\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})')
+
+# ElementTree caches compiled XPath selectors keyed by the query string, so the fallback queries
+# live here as constants to guarantee the cache is hit on every file
+XMP_DATE_TIME_ORIGINAL_XPATH = ".//{http://www.w3.org/1999/02/22-rdf-syntax-ns#}Description[@{http://ns.adobe.com/exif/1.0/}DateTimeOriginal]"
+XMP_DATE_CREATED_XPATH = ".//{http://ns.adobe.com/photoshop/1.0/}DateCreated"
+
+# File types handled by the format parsers and filename/mtime fallbacks
+SUPPORTED_EXTENSIONS = frozenset(['.jpg', '.jpeg', '.mp4', '.m4v', '.mov', '.heic', '.png', '.tif', '.tiff', '.avi', '.mpg', '.mpeg', '.bmp'])
+
+# Date layouts some tools embed in file names, all matched in a single pass:
+# YYYY-MM[-DD[_HHMMSS]], IMG_YYYYMMDD_HHMMSS, IMG-YYYYMMDD and VID_YYYYMMDD
+FILE_NAME_DATE = re.compile(r'(\d{4})-(\d{2})(?:-(\d{2})(?:_(\d{2})(\d{2})(\d{2}))?)?'
+                            r'|IMG_(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})'
+                            r'|(?:IMG-|VID_)(\d{4})(\d{2})(\d{2})')
+
+# Convert a fixed-width "YYYY:MM:DD HH:MM:SS" / "YYYY-MM-DDTHH:MM:SS" style timestamp to a
+# datetime, or None when malformed. The field positions are fixed, so integer slicing is used;
+# it is roughly an order of magnitude faster than strptime.
+def parse_fixed_time_string(time_string):
+    try:
+        return datetime.datetime(int(time_string[0:4]), int(time_string[5:7]), int(time_string[8:10]),
+                                 int(time_string[11:13]), int(time_string[14:16]), int(time_string[17:19]))
+    except ValueError:
+        return None
+
+
 PURPOSE = """
 Organize photos and videos by time of creation
 
@@ -25,46 +76,63 @@ class FileStream:
     LITTLE_ENDIAN = 0
     BIG_ENDIAN = 1
 
+    # Precompiled converters for each (endian, width); indexed by endian constant
+    U16_STRUCTS = (struct.Struct("<H"), struct.Struct(">H"))
+    U32_STRUCTS = (struct.Struct("<I"), struct.Struct(">I"))
+    U64_STRUCTS = (struct.Struct("<Q"), struct.Struct(">Q"))
+
+    # Every field read goes through this class, so keep instances dict-free for faster
+    # attribute access
+    __slots__ = ("length", "position", "buf", "endian", "endian_stack",
+                 "u16_struct", "u32_struct", "u64_struct")
+
     def __init__(self, file_name, mode, endian=None):
-        self.length = 0
-        self.endian = endian if endian else self.LITTLE_ENDIAN
         self.endian_stack = []
-        self.handle = io.open(file_name, mode)
         self.length = os.path.getsize(file_name)
-        self.position_stack = []
+        self.position = 0
+        # Map the file into memory and parse by slicing; metadata parsing only touches
+        # small scattered regions so advise the OS not to read ahead
+        if self.length > 0:
+            fd = os.open(file_name, os.O_RDONLY)
+            try:
+                self.buf = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+            finally:
+                os.close(fd)
+            if hasattr(self.buf, "madvise"):
+                self.buf.madvise(mmap.MADV_RANDOM)
+        else:
+            self.buf = b""
+        self.set_endian(endian if endian else self.LITTLE_ENDIAN)
 
     def close(self):
-        self.handle.close()
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
 
     def set_position(self, position, whence=io.SEEK_SET):
-        self.handle.seek(position, whence)
+        if whence == io.SEEK_CUR:
+            self.position += position
+        elif whence == io.SEEK_END:
+            self.position = self.length + position
+        else:
+            self.position = position
 
     def get_position(self):
-        return self.handle.tell()
-
-    def push_position(self, new_position):
-        current_position = self.get_position()
-        self.position_stack.append(current_position)
-        self.set_position(new_position)
-        return current_position
-
-    def pop_position(self):
-        self.set_position(self.position_stack.pop())
+        return self.position
 
     def get_remaining(self):
-        return self.length - self.handle.tell()
+        return self.length - self.position
 
     def is_eof(self):
-        return self.handle.tell() == self.length
-
-    def flush(self):
-        self.handle.flush()
+        return self.position >= self.length
 
     def get_length(self):
         return self.length
 
     def set_endian(self, value):
         self.endian = value
+        self.u16_struct = self.U16_STRUCTS[value]
+        self.u32_struct = self.U32_STRUCTS[value]
+        self.u64_struct = self.U64_STRUCTS[value]
 
     def get_endian(self):
         return self.endian
@@ -72,47 +140,45 @@ class FileStream:
     def push_endian(self, new_value=None):
         self.endian_stack.append(self.endian)
         if new_value is not None:
-            self.endian = new_value
+            self.set_endian(new_value)
 
     def pop_endian(self):
-        self.endian = self.endian_stack.pop()
+        self.set_endian(self.endian_stack.pop())
 
     def read_u8(self):
-        return ord(self.handle.read(1))
+        value = self.buf[self.position]
+        self.position += 1
+        return value
 
     def read_u8_array(self, length):
-        return bytearray(self.handle.read(length))
+        value = bytearray(self.buf[self.position:self.position + length])
+        self.position += length
+        return value
 
     def read_bool(self):
         value = self.read_u8()
         return False if value == 0 else True
 
     def read_u16(self):
-        if self.endian == self.LITTLE_ENDIAN:
-            value = self.read_u8() + (self.read_u8() << 8)
-        else:
-            value = (self.read_u8() << 8) + self.read_u8()
+        value = self.u16_struct.unpack_from(self.buf, self.position)[0]
+        self.position += 2
         return value
 
     def read_u24(self):
+        data = self.buf[self.position:self.position + 3]
+        self.position += 3
         if self.endian == self.LITTLE_ENDIAN:
-            value = self.read_u8() + (self.read_u8() << 8) + (self.read_u8() << 16)
-        else:
-            value = (self.read_u8() << 16) + (self.read_u8() << 8) + self.read_u8()
-        return value
+            return self.u32_struct.unpack(data + b"\x00")[0]
+        return self.u32_struct.unpack(b"\x00" + data)[0]
 
     def read_u32(self):
-        if self.endian == self.LITTLE_ENDIAN:
-            value = self.read_u16() + (self.read_u16() << 16)
-        else:
-            value = (self.read_u16() << 16) + self.read_u16()
+        value = self.u32_struct.unpack_from(self.buf, self.position)[0]
+        self.position += 4
         return value
 
     def read_u64(self):
-        if self.endian == self.LITTLE_ENDIAN:
-            value = self.read_u32() + (self.read_u32() << 32)
-        else:
-            value = (self.read_u32() << 32) + self.read_u32()
+        value = self.u64_struct.unpack_from(self.buf, self.position)[0]
+        self.position += 8
         return value
 
     def read_string(self, length):
@@ -121,12 +187,13 @@ class FileStream:
 
     # null terminated string; null character is not returned with string
     def read_nt_string(self):
-        output = bytearray()
-        value = self.read_u8()
-        while value != 0:
-            output.append(value)
-            value = self.read_u8()
-        return output.decode("latin_1")
+        # buf.find is a C-level memchr, far faster than a per-byte Python loop
+        end = self.buf.find(b"\x00", self.position)
+        if end < 0:
+            raise ValueError
+        value = self.buf[self.position:end].decode("latin_1")
+        self.position = end + 1
+        return value
 
 
 ###############################################################################################################
@@ -136,41 +203,44 @@ class FileStream:
 # For AVI format see https://msdn.microsoft.com/en-us/library/windows/desktop/dd318189(v=vs.85).aspx
 # For RIFF tags see http://www.sno.phy.queensu.ca/~phil/exiftool/TagNames/RIFF.html
 
-class AVI:
-    def __init__(self):
-        self.file_path = None
-        self.stream = None
-        self.chunk_type_stack = []
-        self.image_time = None
+# RIFF chunk header: four-character id followed by a little-endian size
+AVI_CHUNK_HEADER = struct.Struct("<4sI")
+
+
+# Walk the chunks between the current position and end, recursing into LIST chunks, and return
+# the creation time from the first IDIT chunk found (or None)
+def parse_avi_chunks(stream, end):
+    unpack_header = AVI_CHUNK_HEADER.unpack
+    while stream.get_position() < end:
+        chunk_id, chunk_size = unpack_header(stream.read_u8_array(8))
+        chunk_id = chunk_id.decode("latin_1")
+        if chunk_id == "LIST":
+            list_type = stream.read_string(4)
+            # The movi LIST holds the AV payload and never carries a date tag; IDIT lives in
+            # the hdrl/INFO LISTs near the file start, so skip movi wholesale
+            if list_type == "movi":
+                stream.set_position(chunk_size - 4, io.SEEK_CUR)
+                continue
+            image_time = parse_avi_chunks(stream, stream.get_position() + chunk_size)
+            if image_time:
+                return image_time
+        elif chunk_id == "IDIT":
+            time_string = stream.read_string(chunk_size)[0:-1]
+            time_string = time_string.rstrip(" \r\n")
+            return datetime.datetime.strptime(time_string, "%a %b %d %H:%M:%S %Y")
+        else:
+            stream.set_position(chunk_size, io.SEEK_CUR)
+    return None
 
-    def load(self, file_path):
-        self.file_path = file_path
-        self.stream = FileStream(file_path, "rb")
-        signature = self.stream.read_string(4)
-        if signature != "RIFF":
-            raise ValueError
-        file_size = self.stream.read_u32()
-        file_type = self.stream.read_string(4)
-        self.parse_chunks(file_size)
-
-    def parse_chunks(self, end):
-        while self.stream.get_position() < end:
-            chunk_id = self.stream.read_string(4)
-            chunk_size = self.stream.read_u32()
-            if chunk_id == "LIST":
-                list_type = self.stream.read_string(4)
-                self.chunk_type_stack.append(list_type)
-                self.parse_chunks(self.stream.get_position() + chunk_size)
-                self.chunk_type_stack.pop()
-            elif chunk_id == "IDIT":
-                time_string = self.stream.read_string(chunk_size)[0:-1]
-                time_string = time_string.rstrip(" \r\n")
-                self.image_time = datetime.datetime.strptime(time_string, "%a %b %d %H:%M:%S %Y")
-            else:
-                self.stream.set_position(chunk_size, io.SEEK_CUR)
 
-    def get_image_time(self):
-        return self.image_time
+def parse_avi_time(file_path):
+    stream = FileStream(file_path, "rb")
+    signature = stream.read_string(4)
+    if signature != "RIFF":
+        raise ValueError
+    file_size = stream.read_u32()
+    file_type = stream.read_string(4)
+    return parse_avi_chunks(stream, file_size)
 
 
 ###############################################################################################################
@@ -181,125 +251,126 @@ class AVI:
 # For app segments see http://www.ozhiker.com/electronics/pjmt/jpeg_info/app_segments.html
 # For EXIF format see http://www.exif.org/Exif2-2.PDF
 
-class JPEG:
-    def __init__(self):
-        self.file_path = None
-        self.exif = None
-        self.image_time = None
+def parse_jpeg_time(file_path):
+    image_time = None
+    stream = FileStream(file_path, 'rb', FileStream.BIG_ENDIAN)
+    while not stream.is_eof():
+        # Markers always start with 0xff; locate the next one with a C-level find so any
+        # padding between segments is skipped without per-byte reads
+        position = stream.buf.find(b"\xff", stream.get_position())
+        if position < 0:
+            break
+        stream.set_position(position)
+        marker = stream.read_u16()
+        if marker == 0xffff:            # fill byte preceding a marker
+            stream.set_position(-1, io.SEEK_CUR)
+            continue
 
-    def load(self, file_path):
-        self.file_path = file_path
-        stream = FileStream(file_path, 'rb', FileStream.BIG_ENDIAN)
-        while not stream.is_eof():
-            marker = stream.read_u16()
-
-            # start of image marker
-            if marker == 0xffd8:
-                pass
-
-            # app1/app3 markers
-            elif marker == 0xffe1 or marker == 0xffe3:
-                length = stream.read_u16() - 2
-                position = stream.get_position()
-
-                signature = stream.read_string(4)
-                if signature == "Exif" or signature == "Meta":
-                    stream.set_position(2, io.SEEK_CUR)
-                    stream.push_endian()
-                    t = TIFF()
-                    t.init(stream)
-                    t.parse()
-                    stream.pop_endian()
-                    stream.set_position(position + length)
-                    if not self.image_time:
-                        self.image_time = t.get_image_time()
-
-                # Adobe 'http' metadata or 'XMP\x00' metadata
-                elif signature == "http" or signature == "XMP\x00":
-                    url_string = stream.read_nt_string()
-                    text_length = length - len(url_string) - 5
-                    text = stream.read_string(text_length)
-                    text = text.rstrip(" \r\n\x00")
-                    xml_root = ET.fromstring(text)
-                    element = xml_root.find(".//{http://www.w3.org/1999/02/22-rdf-syntax-ns#}Description[@{http://ns.adobe.com/exif/1.0/}DateTimeOriginal]")
+        # start of image marker
+        if marker == 0xffd8:
+            pass
+
+        # app1/app3 markers
+        elif marker == 0xffe1 or marker == 0xffe3:
+            length = stream.read_u16() - 2
+            position = stream.get_position()
+
+            signature = stream.read_string(4)
+            if signature == "Exif" or signature == "Meta":
+                stream.set_position(2, io.SEEK_CUR)
+                stream.push_endian()
+                t = TIFF()
+                t.init(stream)
+                t.parse()
+                stream.pop_endian()
+                stream.set_position(position + length)
+                if not image_time:
+                    image_time = t.get_image_time()
+
+            # Adobe 'http' metadata or 'XMP\x00' metadata
+            elif signature == "http" or signature == "XMP\x00":
+                url_string = stream.read_nt_string()
+                text_length = length - len(url_string) - 5
+                text = bytes(stream.read_u8_array(text_length))
+                timestamp = None
+                match = XMP_DATE_TIME_ORIGINAL.search(text)
+                if match:
+                    timestamp = match.group(1).decode("latin_1")
+                else:
+                    xml_root = ET.fromstring(text.decode("latin_1").rstrip(" \r\n\x00"))
+                    element = xml_root.find(XMP_DATE_TIME_ORIGINAL_XPATH)
                     if element is not None:
                         timestamp = element.attrib["{http://ns.adobe.com/exif/1.0/}DateTimeOriginal"][0:19]
-                        self.image_time = datetime.datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S")
-                else:
+                if timestamp:
+                    image_time = parse_fixed_time_string(timestamp)
+            else:
+                raise ValueError
+
+        # app13 marker (Adobe IRB)
+        elif marker == 0xffed:
+            length = stream.read_u16() - 2
+
+            # Parse IRB blocks from the whole segment in memory; one bulk read plus
+            # struct.unpack_from is much cheaper than dozens of per-field stream reads
+            # See 'Image Resource Blocks' in http://www.adobe.com/devnet-apps/photoshop/fileformatashtml/
+            payload = bytes(stream.read_u8_array(length))
+            pos = payload.find(b"\x00") + 1         # skip photoshop version string
+            while pos < length:
+                if payload[pos:pos + 4] != b"8BIM":
                     raise ValueError
+                resource_type, resource_name_length = struct.unpack_from(">HB", payload, pos + 4)
+                pos += 7 + resource_name_length
+                if (resource_name_length & 1) == 0:
+                    pos += 1
+                resource_data_length = struct.unpack_from(">I", payload, pos)[0]
+                pos += 4
+
+                if resource_type == 0x404:
+                    # IPTC-NAA Record; See https://www.iptc.org/std/IIM/4.1/specification/IIMV4.1.pdf
+                    # N.B. this record can be shorter than the resource_data_length specified; it appears the
+                    # resource length is padded to the next word boundary
+                    iptc_end = pos + resource_data_length
+                    while pos < iptc_end - 3:
+                        tag_marker, record_number, data_set_number, data_field_count = struct.unpack_from(">BBBH", payload, pos)
+                        pos += 5
+
+                        # Any of these record types can contain a date
+                        # 1:70 (Date Sent), 2:30 (Release Date), 2:55 (Date Created), 2:62 (Digital Creation Date)
+                        if (record_number == 1 and data_set_number == 70) \
+                                or (record_number == 2 and data_set_number == 30) \
+                                or (record_number == 2 and data_set_number == 55) \
+                                or (record_number == 2 and data_set_number == 62):
+                            date_string = payload[pos:pos + data_field_count].decode("latin_1")
+                            image_time = datetime.datetime.strptime(date_string, "%Y%m%d")
+                        pos += data_field_count
+
+                    # Adjust the position since it may not be in the correct place due to the IPTC
+                    # record being shorter than actually specified in the resource length
+                    pos = iptc_end
+                else:
+                    pos += resource_data_length
 
-            # app13 marker (Adobe IRB)
-            elif marker == 0xffed:
-                length = stream.read_u16() - 2
-
-                # Parse IRB blocks
-                # See 'Image Resource Blocks' in http://www.adobe.com/devnet-apps/photoshop/fileformatashtml/
-                irb_end = stream.get_position() + length
-                photoshop_version = stream.read_nt_string()
-                while stream.get_position() < irb_end:
-                    irb_signature = stream.read_string(4)
-                    if irb_signature != "8BIM":
-                        raise ValueError
-
-                    resource_type = stream.read_u16()
-                    resource_name_length = stream.read_u8()
-                    resource_name = stream.read_string(resource_name_length)
-                    if (resource_name_length & 1) == 0:
-                        stream.set_position(1, io.SEEK_CUR)
-                    resource_data_length = stream.read_u32()
-
-                    if resource_type == 0x404:
-                        # IPTC-NAA Record; See https://www.iptc.org/std/IIM/4.1/specification/IIMV4.1.pdf
-                        # N.B. this record can be shorter than the resource_data_length specified; it appears the
-                        # resource length is padded to the next word boundary
-                        iptc_end = stream.get_position() + resource_data_length
-                        while stream.get_position() < iptc_end - 3:
-                            tag_marker = stream.read_u8()
-                            record_number = stream.read_u8()
-                            data_set_number = stream.read_u8()
-                            data_field_count = stream.read_u16()
-
-                            # Any of these record types can contain a date
-                            # 1:70 (Date Sent), 2:30 (Release Date), 2:55 (Date Created), 2:62 (Digital Creation Date)
-                            if (record_number == 1 and data_set_number == 70) \
-                                    or (record_number == 2 and data_set_number == 30) \
-                                    or (record_number == 2 and data_set_number == 55) \
-                                    or (record_number == 2 and data_set_number == 62):
-                                date_string = stream.read_string(data_field_count)
-                                self.image_time = datetime.datetime.strptime(date_string, "%Y%m%d")
-                            else:
-                                stream.set_position(data_field_count, io.SEEK_CUR)
-
-                        # Adjust the stream position since it may not be in the correct place due to the IPTC
-                        # record being shorter than actually specified in the resource length
-                        stream.set_position(iptc_end)
-                    else:
-                        stream.set_position(resource_data_length, io.SEEK_CUR)
-
-                    # Resources are always padded to the next 16-bit boundary
-                    if (resource_data_length & 1) == 1:
-                        stream.set_position(1, io.SEEK_CUR)
-
-            # start of scan marker
-            elif marker == 0xffda:
-                length = stream.read_u16() - 2
-                self.scan_header = stream.read_u8_array(length)
-                # Assume this marker is the last marker except for the end of image marker
-                length = stream.get_length() - stream.get_position() - 2
-                self.scan_data = stream.read_u8_array(length)
-                break
+                # Resources are always padded to the next 16-bit boundary
+                if (resource_data_length & 1) == 1:
+                    pos += 1
 
-            # end of image marker
-            elif marker == 0xffd9:
-                break
+        # start of scan marker; all metadata segments precede the scan data so stop here
+        elif marker == 0xffda:
+            break
 
-            # any other markers are unhandled for now
-            else:
-                length = stream.read_u16() - 2
-                stream.set_position(length, io.SEEK_CUR)
+        # end of image marker
+        elif marker == 0xffd9:
+            break
 
-    def get_image_time(self):
-        return self.image_time
+        # any other markers are unhandled for now
+        else:
+            length = stream.read_u16() - 2
+            stream.set_position(length, io.SEEK_CUR)
+
+        # Stop parsing as soon as a timestamp has been found
+        if image_time:
+            break
+    return image_time
 
 
 ###############################################################################################################
@@ -316,214 +387,235 @@ class JPEG:
 
 class MP4:
     def __init__(self):
-        self.url = None
         self.stream = None
         self.image_time = None
         self.exif_id = None
 
     def load(self, url):
-        self.url = url
         self.stream = FileStream(url, 'rb', FileStream.BIG_ENDIAN)
         self.parse(self.stream.get_length())
 
-    # Parse one or more sequential atoms and try to locate image creation time
+    # Parse one or more sequential atoms and try to locate image creation time. Atoms are walked
+    # iteratively with a stack of container end positions, which avoids a Python frame per nested
+    # atom; HEIC files in particular nest containers deeply.
     def parse(self, end_position):
-        while self.stream.get_position() < end_position:
+        # Bind the hot stream methods to locals; the atom walk is pure interpreter work and
+        # attribute lookups per atom add up over tens of thousands of files
+        stream = self.stream
+        read_u32 = stream.read_u32
+        get_position = stream.get_position
+        get_handler = self.ATOM_HANDLERS.get
+        boundary_stack = [end_position]
+        while boundary_stack:
+            # Stop parsing once a timestamp has been found, unless we are still waiting to
+            # resolve the location of an Exif item (HEIC files)
+            if self.image_time and self.exif_id is None:
+                return
+            if get_position() >= boundary_stack[-1]:
+                boundary_stack.pop()
+                continue
+
             # Parse the atom header
-            atom_size = self.stream.read_u32()
+            atom_size = read_u32()
             if atom_size == 0:                      # Size of 0 means 'parse to end of file'
                 continue                            # We can ignore because we parse to the end of the atom list anyway
-            atom_type = self.stream.read_string(4)
-            atom_size = self.stream.read_u64() if atom_size == 1 else atom_size
-            atom_type = self.stream.read_u8_array(8) if atom_type == 0x75756964 else atom_type
-            atom_version = 0
-            atom_flags = 0
+            atom_type = stream.read_string(4)
+            atom_size = stream.read_u64() if atom_size == 1 else atom_size
+            atom_type = stream.read_u8_array(8) if atom_type == 0x75756964 else atom_type
 
             # These atoms are containers for other atoms
             if atom_type in ['moov', 'udta', 'meta']:
-                self.parse(self.stream.get_position() + atom_size - 8)
-
-            # Parse Movie Header atom
-            elif atom_type == 'mvhd':
-                self.version = self.stream.read_u8()
-                self.flags = self.stream.read_u8_array(3)
-                self.creation_time = self.stream.read_u32()         # this is what we're looking for
-                self.modification_time = self.stream.read_u32()
-                self.time_scale = self.stream.read_u32()
-                self.duration = self.stream.read_u32()
-                self.preferred_rate = self.stream.read_u32()
-                self.preferred_volume = self.stream.read_u16()
-                self.stream.set_position(10, io.SEEK_CUR)        # skip reserved bytes
-                self.matrix = self.stream.read_u8_array(36)
-                self.preview_time = self.stream.read_u32()
-                self.preview_duration = self.stream.read_u32()
-                self.poster_time = self.stream.read_u32()
-                self.selection_time = self.stream.read_u32()
-                self.selection_duration = self.stream.read_u32()
-                self.current_time = self.stream.read_u32()
-                self.next_track_id = self.stream.read_u32()
-
-                # Convert the creation time to a datetime object
-                if self.creation_time != 0:
-                    mac_unix_epoch_diff = 2082844800        # Difference in seconds between mac and unix epoch times
-                    timestamp = self.creation_time - mac_unix_epoch_diff
-                    self.image_time = datetime.datetime.utcfromtimestamp(timestamp)
-
-            # Parse iTunes metadata
-            elif atom_type == '\xa9day':
-                data_size = self.stream.read_u16()
-                data_language = self.stream.read_u16()
-                time_string = self.stream.read_string(data_size)[0:19]
-                try:
-                    self.image_time = datetime.datetime.strptime(time_string, '%Y-%m-%dT%H:%M:%S')
-                except ValueError:
-                    pass
-
-            # Parse Item Information Box (found in Apple HEIC files)
-            elif atom_type == 'iinf':
-                atom_version = self.stream.read_u8()
-                atom_flags = self.stream.read_u24()
-                if atom_version == 0:
-                    item_count = self.stream.read_u16()
-                    self.parse(self.stream.get_position() + atom_size - 14)
-                else:
-                    item_count = self.stream.read_u32()
-                    self.parse(self.stream.get_position() + atom_size - 16)
-
-            # Parse Item Information Entry (found in Apple HEIC files)
-            # Here we're looking for the index to the Exif data, which we will then look up in the 'iloc' atom
-            elif atom_type == 'infe':
-                atom_version = self.stream.read_u8()
-                atom_flags = self.stream.read_u24()
-                if atom_version == 2:
-                    item_id = self.stream.read_u16()
-                    item_index = self.stream.read_u16()
-                    item_type = self.stream.read_string(4)
-                    item_name = self.stream.read_nt_string()
-                    if item_type == 'Exif':
-                        self.exif_id = item_id
-                    else:
-                        self.stream.set_position(atom_size - 21, whence=io.SEEK_CUR)
-                else:
-                    sys.exit('Unsupported INFE atom version')
-
-            # Parse Item Location Box (found in Apple HEIC files)
-            elif atom_type == 'iloc':
-                atom_version = self.stream.read_u8()
-                atom_flags = self.stream.read_u24()
-                offset_size = self.stream.read_u8()
-                length_size = offset_size & 0x0f
-                offset_size >>= 4
-                base_offset_size = self.stream.read_u8()
-                index_size = base_offset_size & 0x0f
-                base_offset_size >>= 4
-                item_count = self.stream.read_u16() if atom_version < 2 else self.stream.read_u32()
-                extent_offset = extent_length = 0
-                for i in range(item_count):
-                    item_id = self.stream.read_u16() if atom_version < 2 else self.stream.read_u32()
-                    if atom_version == 1 or atom_version == 2:
-                        construction_method = self.stream.read_u16() & 0x000f
-                    else:
-                        construction_method = 0
-                    data_reference_index = self.stream.read_u16()
-                    if base_offset_size > 0:
-                        base_offset = self.stream.read_u32() if base_offset_size == 4 else self.stream.read_u64()
-                    else:
-                        base_offset = 0
-                    extent_count = self.stream.read_u16()
-                    for j in range(extent_count):
-                        if (atom_version == 1 or atom_version == 2) and index_size > 0:
-                            extent_index = self.stream.read_u32() if index_size == 4 else self.stream.read_u64()
-                        else:
-                            extent_index = 0
-                        extent_offset = self.stream.read_u32() if offset_size == 4 else self.stream.read_u64()
-                        extent_length = self.stream.read_u32() if length_size == 4 else self.stream.read_u64()
-
-                    # If this is the Exif item then decode it
-                    if item_id == self.exif_id:
-                        self.stream.push_position(extent_offset)
-                        # Read Exif marker
-                        marker_length = self.stream.read_u32()
-                        marker = self.stream.read_string(4)
-                        if marker != 'Exif':
-                            sys.exit('Invalid exif marker')
-                        self.stream.set_position(marker_length-4, io.SEEK_CUR)
-                        # Parse Exif to extract creation date
-                        t = TIFF()
-                        t.init(self.stream)
-                        t.parse()
-                        self.image_time = t.get_image_time()
-                        self.stream.pop_position()
-
-            # All other types are skipped
+                boundary_stack.append(get_position() + atom_size - 8)
+                continue
+
+            handler = get_handler(atom_type)
+            if handler is not None:
+                handler(self, atom_size, boundary_stack)
+            else:
+                # All other types are skipped
+                stream.set_position(atom_size - 8, io.SEEK_CUR)
+
+    # Parse Movie Header atom
+    def parse_mvhd(self, atom_size, boundary_stack):
+        self.stream.set_position(4, io.SEEK_CUR)            # skip version and flags
+        creation_time = self.stream.read_u32()              # this is what we're looking for
+        self.stream.set_position(atom_size - 16, io.SEEK_CUR)   # skip the rest of the atom
+
+        # Convert the creation time to a datetime object
+        if creation_time != 0:
+            mac_unix_epoch_diff = 2082844800        # Difference in seconds between mac and unix epoch times
+            timestamp = creation_time - mac_unix_epoch_diff
+            self.image_time = datetime.datetime.utcfromtimestamp(timestamp)
+
+    # Parse iTunes metadata
+    def parse_day(self, atom_size, boundary_stack):
+        data_size = self.stream.read_u16()
+        data_language = self.stream.read_u16()
+        time_string = self.stream.read_string(data_size)[0:19]
+        image_time = parse_fixed_time_string(time_string)
+        if image_time:
+            self.image_time = image_time
+
+    # Parse Item Information Box (found in Apple HEIC files); a container once the item count
+    # has been consumed, so push its end position and keep walking
+    def parse_iinf(self, atom_size, boundary_stack):
+        atom_version = self.stream.read_u8()
+        atom_flags = self.stream.read_u24()
+        if atom_version == 0:
+            item_count = self.stream.read_u16()
+            boundary_stack.append(self.stream.get_position() + atom_size - 14)
+        else:
+            item_count = self.stream.read_u32()
+            boundary_stack.append(self.stream.get_position() + atom_size - 16)
+
+    # Parse Item Information Entry (found in Apple HEIC files)
+    # Here we're looking for the index to the Exif data, which we will then look up in the 'iloc' atom
+    def parse_infe(self, atom_size, boundary_stack):
+        atom_version = self.stream.read_u8()
+        atom_flags = self.stream.read_u24()
+        if atom_version == 2:
+            item_id = self.stream.read_u16()
+            item_index = self.stream.read_u16()
+            item_type = self.stream.read_string(4)
+            item_name = self.stream.read_nt_string()
+            if item_type == 'Exif':
+                self.exif_id = item_id
+            else:
+                self.stream.set_position(atom_size - 21, whence=io.SEEK_CUR)
+        else:
+            sys.exit('Unsupported INFE atom version')
+
+    # Parse Item Location Box (found in Apple HEIC files)
+    def parse_iloc(self, atom_size, boundary_stack):
+        atom_version = self.stream.read_u8()
+        atom_flags = self.stream.read_u24()
+        offset_size = self.stream.read_u8()
+        length_size = offset_size & 0x0f
+        offset_size >>= 4
+        base_offset_size = self.stream.read_u8()
+        index_size = base_offset_size & 0x0f
+        base_offset_size >>= 4
+        item_count = self.stream.read_u16() if atom_version < 2 else self.stream.read_u32()
+        extent_offset = extent_length = 0
+        for i in range(item_count):
+            item_id = self.stream.read_u16() if atom_version < 2 else self.stream.read_u32()
+            if atom_version == 1 or atom_version == 2:
+                construction_method = self.stream.read_u16() & 0x000f
             else:
-                self.stream.set_position(atom_size - 8, io.SEEK_CUR)
+                construction_method = 0
+            data_reference_index = self.stream.read_u16()
+            if base_offset_size > 0:
+                base_offset = self.stream.read_u32() if base_offset_size == 4 else self.stream.read_u64()
+            else:
+                base_offset = 0
+            extent_count = self.stream.read_u16()
+            for j in range(extent_count):
+                if (atom_version == 1 or atom_version == 2) and index_size > 0:
+                    extent_index = self.stream.read_u32() if index_size == 4 else self.stream.read_u64()
+                else:
+                    extent_index = 0
+                extent_offset = self.stream.read_u32() if offset_size == 4 else self.stream.read_u64()
+                extent_length = self.stream.read_u32() if length_size == 4 else self.stream.read_u64()
+
+            # If this is the Exif item then decode it
+            if item_id == self.exif_id:
+                saved_position = self.stream.get_position()
+                self.stream.set_position(extent_offset)
+                # Read Exif marker
+                marker_length = self.stream.read_u32()
+                marker = self.stream.read_string(4)
+                if marker != 'Exif':
+                    sys.exit('Invalid exif marker')
+                self.stream.set_position(marker_length-4, io.SEEK_CUR)
+                # Parse Exif to extract creation date
+                t = TIFF()
+                t.init(self.stream)
+                t.parse()
+                self.image_time = t.get_image_time()
+                self.stream.set_position(saved_position)
+
+    ATOM_HANDLERS = {
+        'mvhd': parse_mvhd,
+        '\xa9day': parse_day,
+        'iinf': parse_iinf,
+        'infe': parse_infe,
+        'iloc': parse_iloc,
+    }
 
     def get_image_time(self):
         return self.image_time
 
 
+# MP4 keeps its class form because the atom handlers share mutable state (exif_id discovered in
+# one atom, resolved in another); this wrapper gives it the same call shape as the other parsers
+def parse_mp4_time(file_path):
+    mp4 = MP4()
+    mp4.load(file_path)
+    return mp4.image_time
+
+
 ###############################################################################################################
 # PNG format
 ###############################################################################################################
 
 # For PNG format see https://www.w3.org/TR/PNG/
 
-class PNG:
-    def __init__(self):
-        self.file_path = None
-        self.image_time = None
-
-    def load(self, file_path):
-        self.file_path = file_path
-        stream = FileStream(file_path, "rb", FileStream.BIG_ENDIAN)
-        id1 = stream.read_u32()
-        id2 = stream.read_u32()
-        if id1 == 0x89504e47 and id2 == 0x0d0a1a0a:
-            while not stream.is_eof():
-                length = stream.read_u32()
-                type = stream.read_string(4)
-                if type == "tIME":
-                    year = stream.read_u16()
-                    month = stream.read_u8()
-                    day = stream.read_u8()
-                    hour = stream.read_u8()
-                    minute = stream.read_u8()
-                    second = stream.read_u8()
-                    self.image_time = datetime.datetime(year, month, day, hour, minute, second)
-                    crc = stream.read_u32()
-                elif type == "tEXt":                # text
-                    stream.set_position(length, io.SEEK_CUR)
-                    crc = stream.read_u32()
-                elif type == "zTXt":                # deflated text
-                    stream.set_position(length, io.SEEK_CUR)
-                    crc = stream.read_u32()
-                elif type == "iTXt":                # international text
-                    index = stream.get_position()
-                    keyword = stream.read_nt_string()
-                    compression_flag = stream.read_u8()
-                    compression_method = stream.read_u8()
-                    language_tag = stream.read_nt_string()
-                    translated_keyword = stream.read_nt_string()
-                    text_length = length - (stream.get_position() - index)
-                    text = stream.read_string(text_length)
-                    if keyword == "XML:com.adobe.xmp":
-                        xml_root = ET.fromstring(text)
-                        date_element = xml_root.find(".//{http://ns.adobe.com/photoshop/1.0/}DateCreated")
+def parse_png_time(file_path):
+    image_time = None
+    stream = FileStream(file_path, "rb", FileStream.BIG_ENDIAN)
+    id1 = stream.read_u32()
+    id2 = stream.read_u32()
+    if id1 == 0x89504e47 and id2 == 0x0d0a1a0a:
+        while not stream.is_eof():
+            length = stream.read_u32()
+            type = stream.read_string(4)
+            if type == "tIME":
+                year = stream.read_u16()
+                month = stream.read_u8()
+                day = stream.read_u8()
+                hour = stream.read_u8()
+                minute = stream.read_u8()
+                second = stream.read_u8()
+                image_time = datetime.datetime(year, month, day, hour, minute, second)
+                crc = stream.read_u32()
+            elif type == "tEXt":                # text
+                stream.set_position(length, io.SEEK_CUR)
+                crc = stream.read_u32()
+            elif type == "zTXt":                # deflated text
+                stream.set_position(length, io.SEEK_CUR)
+                crc = stream.read_u32()
+            elif type == "iTXt":                # international text
+                index = stream.get_position()
+                keyword = stream.read_nt_string()
+                compression_flag = stream.read_u8()
+                compression_method = stream.read_u8()
+                language_tag = stream.read_nt_string()
+                translated_keyword = stream.read_nt_string()
+                text_length = length - (stream.get_position() - index)
+                text = bytes(stream.read_u8_array(text_length))
+                if keyword == "XML:com.adobe.xmp":
+                    timestamp = None
+                    match = XMP_DATE_CREATED.search(text)
+                    if match:
+                        timestamp = match.group(1).decode("latin_1")
+                    else:
+                        xml_root = ET.fromstring(text.decode("latin_1"))
+                        date_element = xml_root.find(XMP_DATE_CREATED_XPATH)
                         if date_element is not None:
-                            try:
-                                self.image_time = datetime.datetime.strptime(date_element.text, "%Y-%m-%dT%H:%M:%S")
-                            except ValueError:
-                                pass
-                    crc = stream.read_u32()
-                elif type == "IEND":
-                    break
-                else:
-                    stream.set_position(length, io.SEEK_CUR)
-                    crc = stream.read_u32()
+                            timestamp = date_element.text
+                    if timestamp:
+                        image_time = parse_fixed_time_string(timestamp)
+                crc = stream.read_u32()
+            elif type == "IEND":
+                break
+            else:
+                stream.set_position(length, io.SEEK_CUR)
+                crc = stream.read_u32()
 
-    def get_image_time(self):
-        return self.image_time
+            # Stop parsing as soon as a timestamp has been found
+            if image_time:
+                break
+    return image_time
 
 
 ###############################################################################################################
@@ -534,25 +626,37 @@ class PNG:
 # For EXIF tags see http://www.sno.phy.queensu.ca/~phil/exiftool/TagNames/EXIF.html
 
 class TIFF:
+
+    # IFD entry: tag, type, count, value/offset; indexed by endian constant
+    IFD_ENTRY_STRUCTS = (struct.Struct("<HHII"), struct.Struct(">HHII"))
+
+    # DateTimeOriginal is the field we actually want; CreateDate and ModifyDate are accepted as
+    # stand-ins with decreasing priority. Parsing stops once the top-priority tag has been seen.
+    DATE_TAG_PRIORITY = {0x9003: 3, 0x9004: 2, 0x0132: 1}
+    BEST_DATE_PRIORITY = 3
+
     def __init__(self):
-        self.url = None
         self.stream = None
         self.ifd_start = 0
         self.image_time = None
+        self.date_priority = 0
 
     def init(self, stream):
         self.stream = stream
 
     def open(self, url):
-        self.url = url
         self.stream = FileStream(url, "rb")
 
     def parse(self):
+        # IFDs (including sub-IFDs and the next-IFD chain) are queued and walked iteratively;
+        # recursing per sub-IFD costs a Python frame on top of the per-entry work
         self.parse_header()
-        next_ifd = self.parse_ifd()
-        while next_ifd != 0:
-            self.stream.set_position(self.ifd_start + next_ifd)
-            next_ifd = self.parse_ifd()
+        todo = [self.stream.get_position()]
+        while todo and self.date_priority < self.BEST_DATE_PRIORITY:
+            self.stream.set_position(todo.pop())
+            next_ifd = self.parse_ifd(todo)
+            if next_ifd != 0:
+                todo.append(self.ifd_start + next_ifd)
 
     def parse_header(self):
         # All IFD offsets are relative to this position
@@ -576,47 +680,246 @@ class TIFF:
         ifd_offset = self.stream.read_u32()
         self.stream.set_position(self.ifd_start + ifd_offset)
 
-    def parse_ifd(self):
+    def parse_ifd(self, todo):
+        # Read the whole entry block in one go and unpack it in C; most entries carry tags we do
+        # not care about, so they are skipped with nothing more than a dict lookup
         num_entries = self.stream.read_u16()
-        for i in range(num_entries):
-            tag = self.stream.read_u16()
-            type = self.stream.read_u16()
-            count = self.stream.read_u32()
-            offset = self.ifd_start + self.stream.read_u32()
-
-            # This tag provides an offset to another IFD
-            if tag == 0x8769:             # ExifOffset
-                self.stream.push_position(offset)
-                self.parse_ifd()
-                self.stream.pop_position()
-
-            # If tag is one of ModifyDate, DateTimeOriginal or CreateDate then attempt to extract a timestamp
-            elif tag in [0x0132, 0x9003, 0x9004]:
-                self.stream.push_position(offset)
-                time_string = self.stream.read_string(count - 1)
-                self.stream.pop_position()
-                if time_string[0:4] != "0000":
-                    try:
-                        self.image_time = datetime.datetime.strptime(time_string, "%Y:%m:%d %H:%M:%S")
-                    except ValueError:
-                        # Sometimes dates can be malformed, e.g. Feb 29 in a non-leap year. Attempt to handle this.
-                        try:
-                            dt = datetime.datetime.strptime(time_string[0:7], "%Y:%m")
-                            days = int(time_string[8:10])
-                            delta = datetime.timedelta(days-1)
-                            self.image_time = dt + delta
-                        except ValueError:
-                            pass
-            else:
-                pass
+        entry_block = self.stream.read_u8_array(12 * num_entries)
+        entry_struct = self.IFD_ENTRY_STRUCTS[self.stream.get_endian()]
+        for tag, type, count, offset in entry_struct.iter_unpack(entry_block):
+            handler = self.TAG_HANDLERS.get(tag)
+            if handler is not None:
+                handler(self, tag, count, self.ifd_start + offset, todo)
+                if self.date_priority >= self.BEST_DATE_PRIORITY:
+                    break
 
         next_ifd = self.stream.read_u32()
         return next_ifd
 
+    # ExifOffset tag; provides an offset to another IFD
+    def parse_exif_offset(self, tag, count, offset, todo):
+        todo.append(offset)
+
+    # ModifyDate, DateTimeOriginal or CreateDate tag; attempt to extract a timestamp
+    def parse_date_tag(self, tag, count, offset, todo):
+        priority = self.DATE_TAG_PRIORITY[tag]
+        if priority <= self.date_priority:
+            return
+        # Slice the value straight out of the mapping; the stream cursor is not disturbed
+        time_string = self.stream.buf[offset:offset + count - 1].decode("latin_1")
+        if time_string[0:4] == "0000":
+            return
+        image_time = parse_fixed_time_string(time_string)
+        if image_time is None:
+            # Sometimes dates can be malformed, e.g. Feb 29 in a non-leap year. Attempt to handle this.
+            try:
+                dt = datetime.datetime(int(time_string[0:4]), int(time_string[5:7]), 1)
+                days = int(time_string[8:10])
+                delta = datetime.timedelta(days-1)
+                image_time = dt + delta
+            except ValueError:
+                return
+        self.image_time = image_time
+        self.date_priority = priority
+
+    TAG_HANDLERS = {
+        0x8769: parse_exif_offset,      # ExifOffset
+        0x0132: parse_date_tag,         # ModifyDate
+        0x9003: parse_date_tag,         # DateTimeOriginal
+        0x9004: parse_date_tag,         # CreateDate
+    }
+
     def get_image_time(self):
         return self.image_time
 
 
+# TIFF keeps its class form because the IFD walk threads state (ifd_start, date priority) through
+# the tag handlers and is also driven in-stream by the JPEG and MP4 parsers; this wrapper gives
+# standalone .tif files the same call shape as the other parsers
+def parse_tiff_time(file_path):
+    tiff = TIFF()
+    tiff.open(file_path)
+    tiff.parse()
+    return tiff.image_time
+
+
+###############################################################################################################
+# File processing
+###############################################################################################################
+
+# Recursively yield regular files below a folder. os.scandir is used directly instead of os.walk
+# so each DirEntry's cached stat information can be reused rather than re-statting by path.
+def iter_files(folder):
+    for entry in os.scandir(folder):
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_files(entry.path)
+        elif entry.is_file():
+            yield entry
+
+
+# Sidecar cache of previously computed timestamps and fingerprints, keyed by path and validated
+# against size and mtime so any modification invalidates the entry. Rerunning over a collection
+# that has only grown then skips all parsing and hashing for files already seen.
+class ScanCache:
+
+    def __init__(self, cache_path=None):
+        if cache_path is None:
+            cache_folder = os.path.join(os.path.expanduser('~'), '.cache')
+            os.makedirs(cache_folder, exist_ok=True)
+            cache_path = os.path.join(cache_folder, 'organize-photos.sqlite')
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS files '
+                                '(path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, time TEXT, checksum BLOB)')
+        self.pending = []
+
+    # Returns (image_time, checksum) for an unmodified previously-seen file, else None. A stat
+    # result may be passed in (e.g. from a DirEntry) to avoid a second stat syscall.
+    def get(self, file_path, status=None):
+        if status is None:
+            try:
+                status = os.stat(file_path)
+            except OSError:
+                return None
+        row = self.connection.execute('SELECT time, checksum FROM files WHERE path=? AND size=? AND mtime=?',
+                                      (file_path, status.st_size, status.st_mtime_ns)).fetchone()
+        if row is None:
+            return None
+        image_time = datetime.datetime.fromisoformat(row[0]) if row[0] else None
+        return image_time, row[1]
+
+    def put(self, file_path, image_time, checksum):
+        try:
+            status = os.stat(file_path)
+        except OSError:
+            return
+        time_string = image_time.isoformat() if image_time else None
+        self.pending.append((file_path, status.st_size, status.st_mtime_ns, time_string, checksum))
+        if len(self.pending) >= 500:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            with self.connection:
+                self.connection.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)', self.pending)
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+# Extract a creation timestamp from the file name, or None when it carries no recognizable date.
+# One precompiled regex covers all the known layouts in a single pass, rather than probing each
+# strptime format and paying for a raised ValueError on every miss.
+def parse_file_name_time(file_name):
+    match = FILE_NAME_DATE.match(file_name)
+    if not match:
+        return None
+    g = match.groups()
+    if g[0]:                # YYYY-MM[-DD[_HHMMSS]]
+        fields = (int(g[0]), int(g[1]), int(g[2] or 1), int(g[3] or 0), int(g[4] or 0), int(g[5] or 0))
+    elif g[6]:              # IMG_YYYYMMDD_HHMMSS
+        fields = (int(g[6]), int(g[7]), int(g[8]), int(g[9]), int(g[10]), int(g[11]))
+    else:                   # IMG-YYYYMMDD / VID_YYYYMMDD
+        fields = (int(g[12]), int(g[13]), int(g[14]), 0, 0, 0)
+    try:
+        return datetime.datetime(*fields)
+    except ValueError:
+        return None
+
+
+def checksum_file(file_path):
+    if blake3 is not None:
+        h = blake3.blake3()
+        h.update_mmap(file_path)
+        return h.digest()
+    with open(file_path, 'rb') as f:
+        if hasattr(os, 'posix_fadvise'):
+            # Ask for aggressive readahead while hashing, then drop the pages afterwards so
+            # hashing a large collection does not evict the rest of the page cache
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        try:
+            if xxhash is None and hasattr(hashlib, 'file_digest'):
+                # Python 3.11+; feeds OpenSSL directly with the GIL released and no giant allocation
+                return hashlib.file_digest(f, 'sha256').digest()
+            # Hash in 1 MiB chunks; materializing a multi-hundred-MB video as one bytes object
+            # doubles peak memory and blows the cache for no benefit
+            h = xxhash.xxh3_128() if xxhash is not None else hashlib.sha256()
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+            return h.digest()
+        finally:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+# Fast dedup fingerprint: hash of the file size plus the first and last 64 KiB. Identical files
+# always collide on this key; distinct files practically never do, and any collision is confirmed
+# with a full checksum_file comparison before a file is treated as a duplicate.
+def quick_checksum_file(file_path):
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        head = f.read(65536)
+        if size > 131072:
+            f.seek(-65536, io.SEEK_END)
+            tail = f.read(65536)
+        else:
+            tail = f.read()
+    data = struct.pack("<Q", size) + head + tail
+    if blake3 is not None:
+        return blake3.blake3(data).digest()
+    if xxhash is not None:
+        return xxhash.xxh3_128(data).digest()
+    return hashlib.sha256(data).digest()
+
+
+# First pass over a file: cheap filename timestamp probe plus the dedup fingerprint, without
+# opening any format parser. Returns None for unsupported file types; the timestamp is None when
+# the filename carries no date, in which case the metadata pass takes over.
+def scan_file(file_path):
+    file_name = os.path.split(file_path)[1]
+    ext = file_name[file_name.rfind('.'):].lower()
+    if ext not in SUPPORTED_EXTENSIONS:
+        # Not a supported image type so skip this file
+        return None
+
+    # Some tools put the creation date in the file name
+    image_time = parse_file_name_time(file_name)
+
+    return file_path, image_time, quick_checksum_file(file_path)
+
+
+# Parser function for each supported extension; .bmp maps to None because those files don't
+# contain an embedded creation date
+EXTENSION_PARSERS = {
+    '.jpg': parse_jpeg_time, '.jpeg': parse_jpeg_time,
+    '.mp4': parse_mp4_time, '.m4v': parse_mp4_time, '.mov': parse_mp4_time, '.heic': parse_mp4_time,
+    '.png': parse_png_time,
+    '.tif': parse_tiff_time, '.tiff': parse_tiff_time,
+    '.avi': parse_avi_time, '.mpg': parse_avi_time, '.mpeg': parse_avi_time,
+    '.bmp': None,
+}
+
+
+# A fingerprint collision is only treated as a duplicate once both files compare equal on a full
+# content hash; the two hashes run concurrently on the I/O pool
+def confirm_duplicate(io_executor, file_path, existing_path):
+    new_checksum, existing_checksum = io_executor.map(checksum_file, (file_path, existing_path))
+    return new_checksum == existing_checksum
+
+
+# Second pass: extract the creation timestamp from the file metadata. Only invoked for files that
+# survived dedup and whose filename carried no date. Runs in a worker process so each file gets
+# its own FileStream.
+def extract_metadata_time(file_path):
+    parser = EXTENSION_PARSERS.get(file_path[file_path.rfind('.'):].lower())
+    if parser is None:
+        return None
+    return parser(file_path)
+
+
 ###############################################################################################################
 # Entry Point
 ###############################################################################################################
@@ -626,95 +929,107 @@ if __name__ == '__main__':
     if len(sys.argv) < 2:
         sys.exit(PURPOSE)
 
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     # The first path is the destination into which files from all other paths are merged
     destination_path = os.path.expanduser(sys.argv[1]).replace('\\', '/')
     if not os.path.exists(destination_path):
         sys.exit('ERROR: {0} is not a valid path'.format(destination_path))
+    destination_device = os.stat(destination_path).st_dev
+
+    # Per-file work is independent, so it is spread across two pools: metadata parsing is
+    # CPU-bound interpreter work and goes to worker processes, while fingerprinting is dominated
+    # by file I/O and hashing (which releases the GIL) so it runs on threads, overlapping the
+    # open/read latency of one file with the hashing of another. Only the move step (filesystem
+    # mutation) stays single-threaded.
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count())
+    io_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2 * os.cpu_count())
+
+    # Results from previous runs are cached on disk so a rerun over an unchanged collection
+    # skips all parsing and hashing
+    cache = ScanCache()
 
     # Checksum all files in destination folder and identify any duplicates
     destination_checksums = {}
-    print('Calculating checksums (may take a while)...')
-    for path, folders, files in os.walk(destination_path):
-        for file_name in files:
-            file_path = os.path.join(path, file_name).replace('\\', '/')
-            with open(file_path, 'rb') as f:
-                checksum = hashlib.sha256(f.read()).digest()
-            if checksum in destination_checksums:
-                print('Duplicate found in destination: {0}'.format(file_path))
-            else:
-                destination_checksums[checksum] = file_path
+    log.info('Calculating checksums (may take a while)...')
+    cached_checksums = []
+    new_files = []
+    for entry in iter_files(destination_path):
+        file_path = entry.path.replace('\\', '/')
+        cached = cache.get(file_path, entry.stat())
+        if cached is not None:
+            cached_checksums.append((file_path, cached[1]))
+        else:
+            new_files.append(file_path)
+    new_checksums = list(zip(new_files, io_executor.map(quick_checksum_file, new_files)))
+    for file_path, checksum in cached_checksums + new_checksums:
+        existing_path = destination_checksums.get(checksum)
+        if existing_path is None:
+            destination_checksums[checksum] = file_path
+        elif confirm_duplicate(io_executor, file_path, existing_path):
+            log.info('Duplicate found in destination: %s', file_path)
+    for file_path, checksum in new_checksums:
+        cache.put(file_path, None, checksum)
+
+    # Destination folders already created, so the move loop pays the mkdir syscalls only once
+    # per distinct year/month rather than once per file
+    created_folders = set()
 
     # Merge files from all source paths into the destination
     for source_path in sys.argv[2:]:
         image_files = []
-        source_path = os.path.expanduser(source_path).replace('\\', '/')
+        moved_folders = set()
+        # Normalize away trailing slashes; the empty-folder cleanup compares ancestor paths
+        # against source_path by length, which a trailing slash would throw off by one level
+        source_path = os.path.normpath(os.path.expanduser(source_path)).replace('\\', '/')
         if not os.path.exists(source_path):
-            print('{0} is not a valid path (skipping)'.format(source_path))
+            log.warning('%s is not a valid path (skipping)', source_path)
             continue
-        print('Moving files from {0}...'.format(source_path))
-        for path, folders, files in os.walk(source_path):
-            for file_name in files:
-                file_path = os.path.join(path, file_name).replace('\\', '/')
-                base_name, ext = os.path.splitext(file_name)
-                ext = ext.lower()
-
-                # First try to extract the creation timestamp from the file metadata
-                image_time = None
-                if ext in ['.jpg', '.jpeg']:
-                    image = JPEG()
-                    image.load(file_path)
-                    image_time = image.get_image_time()
-                elif ext in ['.mp4', '.m4v', '.mov', '.heic']:
-                    image = MP4()
-                    image.load(file_path)
-                    image_time = image.get_image_time()
-                elif ext == '.png':
-                    image = PNG()
-                    image.load(file_path)
-                    image_time = image.get_image_time()
-                elif ext in ['.tif', '.tiff']:
-                    image = TIFF()
-                    image.open(file_path)
-                    image.parse()
-                    image_time = image.get_image_time()
-                elif ext in ['.avi', '.mpg', '.mpeg']:
-                    image = AVI()
-                    image.load(file_path)
-                    image_time = image.get_image_time()
-                elif ext in ['.bmp']:   # These image files don't contain an embedded creation date
-                    pass
-                else:
-                    # Not a supported image type so skip this file
+        log.info('Moving files from %s...', source_path)
+        scan_results = []
+        new_files = []
+        for entry in iter_files(source_path):
+            if entry.name[entry.name.rfind('.'):].lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            file_path = entry.path.replace('\\', '/')
+            cached = cache.get(file_path, entry.stat())
+            if cached is not None:
+                scan_results.append((file_path, cached[0], cached[1]))
+            else:
+                new_files.append(file_path)
+
+        # First pass: filename timestamps and dedup fingerprints only. Duplicates are dropped
+        # here so they never reach the expensive metadata parse.
+        for result in io_executor.map(scan_file, new_files):
+            if result is not None:
+                scan_results.append(result)
+        for file_path, image_time, checksum in scan_results:
+            existing_path = destination_checksums.get(checksum)
+            if existing_path is not None:
+                if confirm_duplicate(io_executor, file_path, existing_path):
+                    log.info('Duplicate file found: %s same as %s (skipping)', file_path, existing_path)
                     continue
-
-                # Some tools put the creation date in the file name
-                if not image_time:
-                    formats = [('%Y-%m-%d_%H%M%S', 17), ('%Y-%m-%d', 10), ('%Y-%m', 7), ('IMG_%Y%m%d_%H%M%S', 19), ('IMG-%Y%m%d', 12), ('VID_%Y%m%d', 12)]
-                    for format, length in formats:
-                        try:
-                            image_time = datetime.datetime.strptime(file_name[:length], format)
-                            break
-                        except ValueError:
-                            pass
-
-                # As a last resort use the file modification time as the creation timestamp
-                if not image_time:
-                    image_time = datetime.datetime.fromtimestamp(os.path.getmtime(file_path))
-
-                # add to list of files to move
-                image_files.append((file_path, image_time))
+            else:
+                destination_checksums[checksum] = file_path
+            image_files.append([file_path, image_time, checksum])
+
+        # Second pass: parse metadata only for files whose filename carried no date, falling back
+        # to the file modification time as a last resort
+        pending = [item for item in image_files if item[1] is None]
+        for item, image_time in zip(pending, executor.map(extract_metadata_time, [item[0] for item in pending], chunksize=32)):
+            if not image_time:
+                image_time = datetime.datetime.fromtimestamp(os.path.getmtime(item[0]))
+            item[1] = image_time
+
+        # Record the finished results so a rerun does not repeat the work
+        new_file_set = set(new_files)
+        for file_path, image_time, checksum in image_files:
+            if file_path in new_file_set:
+                cache.put(file_path, image_time, checksum)
 
         # Move files to destination folder
         image_files.sort(key=lambda x: x[1])       # sort on timestamp so files are moved in a seemingly logical order
-        for image_path, image_time in image_files:
-
-            # Checksum file; skip if already in destination
-            with open(image_path, 'rb') as f:
-                checksum = hashlib.sha256(f.read()).digest()
-            if checksum in destination_checksums:
-                print('Duplicate file found: {0} same as {1} (skipping)'.format(image_path, destination_checksums[checksum]))
-                continue
-            destination_checksums[checksum] = image_path
+        for image_path, image_time, checksum in image_files:
 
             # Generate full path for destination file
             file_folder, file_name = os.path.split(image_path)
@@ -731,30 +1046,57 @@ if __name__ == '__main__':
 
             # If file is already in correct place then skip (can occur if destination path is also used as an input)
             if image_path == dst:
+                destination_checksums[checksum] = dst
                 continue
 
             # Create the parent folders for the file
             folder_name = os.path.split(dst)[0]
-            if not os.path.exists(folder_name):
+            if folder_name not in created_folders:
                 try:
-                    os.makedirs(folder_name)
+                    os.makedirs(folder_name, exist_ok=True)
                 except os.error:
-                    print('ERROR: Unable to create ' + folder_name)
+                    log.error('ERROR: Unable to create %s', folder_name)
                     continue
+                created_folders.add(folder_name)
 
-            # Move the file
-            print('Moving {0} --> {1}'.format(image_path, dst))
+            # Move the file. Within one filesystem a move is a single rename syscall; only fall
+            # back to shutil.move (copy + unlink, using sendfile on Linux) across devices or if
+            # the rename is refused.
+            log.info('Moving %s --> %s', image_path, dst)
             try:
-                shutil.move(image_path, dst)
+                if os.stat(image_path).st_dev == destination_device:
+                    os.rename(image_path, dst)
+                else:
+                    shutil.move(image_path, dst)
             except PermissionError:
-                print('Failed to move {0}'.format(image_path))
+                log.error('Failed to move %s', image_path)
+                continue
+            except OSError:
+                try:
+                    shutil.move(image_path, dst)
+                except PermissionError:
+                    log.error('Failed to move %s', image_path)
+                    continue
 
-        # Delete empty folders from source path
-        for path, folders, files in os.walk(source_path, topdown=False):
-            if len(files) + len(folders) == 0:
+            # The file now lives at dst; repoint the dedup index so a later collision confirm
+            # (e.g. the same file appearing in a second source folder) reopens a path that exists
+            destination_checksums[checksum] = dst
+            moved_folders.add(os.path.split(image_path)[0])
+
+        # Delete now-empty folders, walking up from each folder we moved files out of rather than
+        # re-walking the whole source tree; rmdir refuses non-empty folders so this stops naturally
+        for folder in sorted(moved_folders, key=len, reverse=True):
+            while len(folder) >= len(source_path):
                 try:
-                    os.rmdir(path)
-                    print(f'removed folder {path}')
+                    os.rmdir(folder)
                 except OSError:
-                    print(f'failed to remove folder {path}')
+                    break
+                log.info('removed folder %s', folder)
+                if folder == source_path:
+                    break
+                folder = os.path.split(folder)[0]
+
+    cache.close()
+    executor.shutdown()
+    io_executor.shutdown()
 